@@ -1,25 +1,39 @@
 import os
-import tempfile
+import atexit
 import logging
-import re
 import random
-import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import orjson
 import requests  # 用於 OCR.space API 請求
+from functools import lru_cache
+from cachetools import TTLCache
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 from flask import Flask, request, abort
 
-from supabase import create_client
+from supabase import Client as SupabaseClient
+from postgrest import SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+from postgrest.exceptions import APIError
+from postgrest.utils import SyncClient
 from linebot.v3 import WebhookHandler
 from linebot.v3.messaging import (
     Configuration, ApiClient, MessagingApi, MessagingApiBlob,
     TextMessage, ReplyMessageRequest, FlexMessage, FlexContainer,
-    PushMessageRequest
+    PushMessageRequest, MulticastRequest, ApiException
 )
 from linebot.v3.webhooks import MessageEvent
 from linebot.v3.messaging.models import QuickReply, QuickReplyItem, MessageAction
 from linebot.v3.exceptions import InvalidSignatureError
 
+from constants import SYMBOL_COMBOS, TIP_TEMPLATES, RANK_MEDALS
+from ocr_parser import parse_seth_ocr
+
 load_dotenv()
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -33,85 +47,264 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 # 修改處：支援多組金鑰 (以逗號分隔)
 OCR_KEYS = [k.strip() for k in os.getenv("OCR_SPACE_API_KEY", "").split(",") if k.strip()]
 ADMIN_LINE_ID = os.getenv("ADMIN_LINE_ID")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "8"))
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_KEEPALIVE = float(os.getenv("SUPABASE_KEEPALIVE", "120"))  # 閒置連線保留秒數；訊息零星時保住熱連線
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "10000"))
+MEMBER_CACHE_TTL = int(os.getenv("MEMBER_CACHE_TTL", "300"))  # 多個 worker 時可調短以縮小資料不同步的時間
 
 configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
+# 分析池 + webhook 本身都會同時打 LINE API，連線池至少要容納這些並行數
+configuration.connection_pool_maxsize = max(configuration.connection_pool_maxsize, ANALYSIS_WORKERS + 4)
+# 共用同一組 ApiClient，保留 urllib3 連線池與 TLS 連線
+API_CLIENT = ApiClient(configuration)
+LINE_API = MessagingApi(API_CLIENT)
+BLOB_API = MessagingApiBlob(API_CLIENT)
+atexit.register(API_CLIENT.close)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# supabase-py 2.0.3 的 ClientOptions 不能傳入 httpx client；postgrest 0.13 由 create_session 建立 session
+# (只帶 base_url/headers/timeout，其餘皆為 httpx 預設)，覆寫它加上 HTTP/2 與連線池上限，版本固定於 requirements.txt
+class PooledPostgrestClient(SyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout):
+        return SyncClient(
+            base_url=base_url, headers=headers, timeout=timeout,
+            http2=True,  # 併發的查詢共用少數幾條 TLS 連線多工傳輸
+            limits=httpx.Limits(max_connections=SUPABASE_MAX_CONNECTIONS, max_keepalive_connections=SUPABASE_MAX_CONNECTIONS, keepalive_expiry=SUPABASE_KEEPALIVE),
+        )
+
+class PooledSupabaseClient(SupabaseClient):
+    # 登入狀態變動時 supabase 會丟掉 postgrest 重建，一樣經過這裡
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=DEFAULT_POSTGREST_CLIENT_TIMEOUT):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+
+supabase = PooledSupabaseClient(SUPABASE_URL, SUPABASE_KEY)
+# 圖片分析 (下載 + OCR + 寫入) 移到背景執行，webhook 立即回 200
+EXECUTOR = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
+
+# 會員資料快取：狀態/等級很少變動，避免每則訊息都查一次 members
+MEMBER_CACHE = TTLCache(maxsize=MEMBER_CACHE_SIZE, ttl=MEMBER_CACHE_TTL)
+_member_lock = threading.Lock()
+_MISSING = object()
+
+# OCR.space 共用連線池：連續多張截圖共用 keep-alive 連線，不必每張重新握手
+OCR_SESSION = requests.Session()
+OCR_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=ANALYSIS_WORKERS))
+
+# OCR 結果快取 (以圖片內容雜湊為 key)，重傳同一張截圖不再呼叫 OCR.space
+OCR_CACHE = TTLCache(maxsize=2048, ttl=86400)
+_ocr_lock = threading.Lock()
+
+# 今日已用「基礎」次數快取 (不含使用額外點數的次數；key 含日期，跨日自然換 key)；本程序寫入後以 RPC 回傳值更新
+DAILY_COUNT = TTLCache(maxsize=10000, ttl=3600)
+_daily_lock = threading.Lock()
+
+# 熱門戰報是全體共用的排行，短暫快取即可，多人同時點選只查一次 usage_logs
+REPORT_CACHE = TTLCache(maxsize=1, ttl=int(os.getenv("REPORT_CACHE_TTL", "30")))
+_report_lock = threading.Lock()
+
+# 已處理過的訊息 ID，擋掉 LINE 重送造成的重複分析
+SEEN_MESSAGES = OrderedDict()
+SEEN_MAX = 10000
+_seen_lock = threading.Lock()
 
 # === 工具函數 ===
+
+# 暫時性錯誤 (限流/閘道) 才重試；postgrest 在非 JSON 錯誤頁時會把 HTTP 狀態碼放在 code
+RETRYABLE_CODES = {"429", "502", "503", "504"}
+# 確定沒送進資料庫的錯誤：連不上、等不到連線池、被閘道限流擋下；寫入也能安全重送
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+def is_retryable(e, idempotent=True):
+    if isinstance(e, UNSENT_ERRORS): return True
+    if isinstance(e, APIError) and str(e.code) == "429": return True
+    # 502/504、連線中斷等情況第一次可能已寫入，只有重送無副作用的請求才重試
+    if not idempotent: return False
+    # 讀取逾時/中斷是讀取最常見的暫時性錯誤
+    if isinstance(e, (httpx.RemoteProtocolError, httpx.TimeoutException, httpx.ReadError)): return True
+    if isinstance(e, APIError):
+        msg = str(e.message or "").lower()
+        return str(e.code) in RETRYABLE_CODES or "rate limit" in msg or "quota" in msg
+    return False
+
+def execute_with_retry(query, attempts=3, base_delay=0.5, idempotent=True):
+    # 指數退避 + 抖動；非暫時性錯誤直接拋出
+    for i in range(attempts):
+        try: return query.execute()
+        except Exception as e:
+            if i == attempts - 1 or not is_retryable(e, idempotent): raise
+            delay = min(base_delay * 2 ** i, 8) * (0.5 + random.random())
+            logger.warning(f"Supabase Retry {i + 1}/{attempts - 1} in {delay:.2f}s: {e}")
+            time.sleep(delay)
+
+TZ = timezone(timedelta(hours=8))
+
 def get_tz_now(): 
-    return datetime.now(timezone(timedelta(hours=8)))
+    return datetime.now(TZ)
+
+def get_today_str():
+    return get_tz_now().strftime('%Y-%m-%d')
+
+def get_member(user_id, today_str):
+    with _member_lock:
+        cached = MEMBER_CACHE.get(user_id, _MISSING)
+    if cached is not _MISSING: return cached
+    # 未命中時會員資料與今日次數一次 RPC 取回，順便預熱次數快取
+    ctx_res = execute_with_retry(supabase.rpc("member_context", {"p_uid": user_id, "p_today": today_str}))
+    ctx = ctx_res.data[0] if ctx_res and ctx_res.data else {}
+    data = {k: ctx.get(k) for k in ("status", "member_level", "extra_limit")} if ctx.get("found") else None
+    with _member_lock:
+        MEMBER_CACHE[user_id] = data
+    set_base_used_today(user_id, today_str, ctx.get("base_used") or 0)
+    return data
+
+def invalidate_member(*user_ids):
+    with _member_lock:
+        for uid in user_ids: MEMBER_CACHE.pop(uid, None)
+
+def is_seen_message(message_id):
+    with _seen_lock:
+        if message_id in SEEN_MESSAGES: return True
+        SEEN_MESSAGES[message_id] = None
+        if len(SEEN_MESSAGES) > SEEN_MAX: SEEN_MESSAGES.popitem(last=False)
+    return False
+
+def forget_message(message_id):
+    with _seen_lock:
+        SEEN_MESSAGES.pop(message_id, None)
+
+def get_base_used_today(user_id, today_str):
+    key = (user_id, today_str)
+    with _daily_lock:
+        cached = DAILY_COUNT.get(key)
+    if cached is not None: return cached
+    # usage_daily 由 usage_logs 的 AFTER INSERT trigger 維護，單列讀取取代 count(*)；扣掉用額外點數的次數
+    # 不用 maybe_single：它會把原本的 APIError 換成 code 204，429/5xx 就不會重試
+    res = execute_with_retry(supabase.table("usage_daily").select("used_count, extra_used").eq("line_user_id", user_id).eq("used_at", today_str).limit(1))
+    row = res.data[0] if res and res.data else {}
+    used = (row.get("used_count") or 0) - (row.get("extra_used") or 0)
+    set_base_used_today(user_id, today_str, used)
+    return used
+
+def set_base_used_today(user_id, today_str, used):
+    with _daily_lock:
+        DAILY_COUNT[(user_id, today_str)] = used
+
+def make_data_hash(room, b):
+    # 固定 32 字元指紋，索引比變長字串小；用 md5 是為了讓 migration 能在 SQL 端把舊的 "{room}_{b}" 換算成同一指紋
+    return hashlib.md5(f"{room}|{b:.2f}".encode(), usedforsecurity=False).hexdigest()
+
+# 快捷選單固定不變，載入時建立一次 (SDK 只會序列化，不會修改它)
+MAIN_MENU = QuickReply(items=[
+    QuickReplyItem(action=MessageAction(label="🔥 熱門戰報", text="熱門戰報")),
+    QuickReplyItem(action=MessageAction(label="📊 我的額度", text="我的額度")),
+    QuickReplyItem(action=MessageAction(label="📘 使用說明", text="使用說明")),
+    QuickReplyItem(action=MessageAction(label="🔓 我要開通", text="我要開通"))
+])
 
 def get_main_menu():
-    return QuickReply(items=[
-        QuickReplyItem(action=MessageAction(label="🔥 熱門戰報", text="熱門戰報")),
-        QuickReplyItem(action=MessageAction(label="📊 我的額度", text="我的額度")),
-        QuickReplyItem(action=MessageAction(label="📘 使用說明", text="使用說明")),
-        QuickReplyItem(action=MessageAction(label="🔓 我要開通", text="我要開通"))
-    ])
+    return MAIN_MENU
+
+def get_quota_exhausted_text(base_limit):
+    return f"⛔ 今日額度已用完 (基礎: {base_limit} + 額外: 0)，請明天再試或聯繫管理員 LINE:adong8989。"
+
+# 開通申請卡片骨架，只有用戶 ID 相關文字會覆寫
+_ADMIN_APPROVE_TEMPLATE_JSON = orjson.dumps({
+    "type": "bubble",
+    "header": {"type": "box", "layout": "vertical", "contents": [{"type": "text", "text": "🔔 新用戶開通申請", "weight": "bold", "color": "#FFFFFF"}], "backgroundColor": "#1976D2"},
+    "body": {"type": "box", "layout": "vertical", "contents": [{"type": "text", "text": "", "size": "xs", "color": "#666666", "wrap": True}]},
+    "footer": {"type": "box", "layout": "horizontal", "spacing": "sm", "contents": [
+        {"type": "button", "action": {"type": "message", "label": "核准普通", "text": ""}, "style": "primary", "color": "#4CAF50"},
+        {"type": "button", "action": {"type": "message", "label": "核准 VIP", "text": ""}, "style": "primary", "color": "#FF9800"}
+    ]}
+})
 
 def get_admin_approve_flex(target_uid):
-    return {
-        "type": "bubble",
-        "header": {"type": "box", "layout": "vertical", "contents": [{"type": "text", "text": "🔔 新用戶開通申請", "weight": "bold", "color": "#FFFFFF"}], "backgroundColor": "#1976D2"},
-        "body": {"type": "box", "layout": "vertical", "contents": [{"type": "text", "text": f"用戶ID:\n{target_uid}", "size": "xs", "color": "#666666", "wrap": True}]},
-        "footer": {"type": "box", "layout": "horizontal", "spacing": "sm", "contents": [
-            {"type": "button", "action": {"type": "message", "label": "核准普通", "text": f"#核准_normal_{target_uid}"}, "style": "primary", "color": "#4CAF50"},
-            {"type": "button", "action": {"type": "message", "label": "核准 VIP", "text": f"#核准_vip_{target_uid}"}, "style": "primary", "color": "#FF9800"}
+    card = orjson.loads(_ADMIN_APPROVE_TEMPLATE_JSON)
+    card["body"]["contents"][0]["text"] = f"用戶ID:\n{target_uid}"
+    buttons = card["footer"]["contents"]
+    buttons[0]["action"]["text"] = f"#核准_normal_{target_uid}"
+    buttons[1]["action"]["text"] = f"#核准_vip_{target_uid}"
+    return card
+
+# 分析卡片骨架，風險等級欄位於載入時套好，其餘文字欄位在 get_flex_card 中覆寫
+_FLEX_CARD_TEMPLATE = {
+    "type": "bubble",
+    "header": {"type": "box", "layout": "vertical", "contents": [{"type": "text", "text": "", "color": "#FFFFFF", "weight": "bold"}], "backgroundColor": ""},
+    "body": {"type": "box", "layout": "vertical", "spacing": "md", "contents": [
+        {"type": "text", "text": "", "size": "xl", "weight": "bold", "color": ""},
+        {"type": "box", "layout": "vertical", "margin": "md", "contents": [
+            {"type": "text", "text": "風險指數", "size": "xs", "color": "#888888"},
+            {"type": "box", "layout": "vertical", "backgroundColor": "#EEEEEE", "height": "8px", "margin": "sm", "cornerRadius": "4px", "contents": [
+                {"type": "box", "layout": "vertical", "width": "", "backgroundColor": "", "height": "8px", "cornerRadius": "4px", "contents": []}
+            ]}
+        ]},
+        {"type": "text", "text": "", "size": "sm", "color": "", "weight": "bold"},
+        {"type": "separator"},
+        {"type": "box", "layout": "vertical", "spacing": "sm", "contents": [
+            {"type": "text", "text": "", "size": "md", "weight": "bold"},
+            {"type": "text", "text": "", "size": "md", "weight": "bold"},
+            {"type": "text", "text": "", "size": "md", "weight": "bold"}
+        ]},
+        {"type": "box", "layout": "vertical", "margin": "md", "backgroundColor": "#F8F8F8", "paddingAll": "10px", "contents": [
+            {"type": "text", "text": "🔮 AI 進場訊號", "weight": "bold", "size": "xs", "color": "#555555"},
+            {"type": "text", "text": "", "size": "sm", "wrap": True}
         ]}
-    }
-
-def get_flex_card(room, n, r, b, trend_text, trend_color, seed_hash):
-    random.seed(seed_hash)
-    if n > 250 or r > 120:
-        base_color = "#D50000"; label = "🚨 高風險 / 建議換房"; risk_percent = "100%"; status = "high"
-    elif n > 150 or r > 110:
-        base_color = "#FFAB00"; label = "⚠️ 中風險 / 謹慎進場"; risk_percent = "60%"; status = "mid"
-    else:
-        base_color = "#00C853"; label = "✅ 低風險 / 數據優良"; risk_percent = "30%"; status = "low"
-    
-    all_items = [("眼睛", 6), ("弓箭", 6), ("權杖蛇", 6), ("彎刀", 6), ("紅寶石", 6), ("藍寶石", 6), ("綠寶石", 6), ("黃寶石", 6), ("紫寶石", 6), ("聖甲蟲", 3)]
-    selected_items = random.sample(all_items, 2)
-    combo = "、".join([f"{name}{random.randint(1, limit)}顆" for name, limit in selected_items])
-    
-    if status == "high":
-        tips = [f"❌ 盤面較硬，雖然出現「{combo}」，但分布太散容易咬分，建議換房。", f"⚠️ 偵測到回收訊號，目前「{combo}」氣場不足，請小心操作。"]
-    elif status == "mid":
-        tips = [f"⚖️ 盤面拉鋸中，若看到「{combo}」頻繁出現，可以考慮小試幾轉。", f"🔍 觀察中：目前「{combo}」頻率尚可，建議平注守好。"]
-    else:
-        tips = [f"✅ 氣場極強！盤面出現「{combo}」組合，大噴發機率攀升。", f"🔥 訊號亮起！出現「{combo}」帶動，大獎可能就在最近幾轉。"]
+    ]}
+}
+
+# 各風險等級固定的顏色/標語/風險條寬度
+RISK_TIERS = {
+    "high": ("#D50000", "🚨 高風險 / 建議換房", "100%"),
+    "mid": ("#FFAB00", "⚠️ 中風險 / 謹慎進場", "60%"),
+    "low": ("#00C853", "✅ 低風險 / 數據優良", "30%"),
+}
+
+def _build_tier_template(base_color, label, risk_percent):
+    card = orjson.loads(orjson.dumps(_FLEX_CARD_TEMPLATE))
+    body = card["body"]["contents"]
+    card["header"]["backgroundColor"] = base_color
+    body[0]["text"] = label; body[0]["color"] = base_color
+    risk_bar = body[1]["contents"][1]["contents"][0]
+    risk_bar["width"] = risk_percent; risk_bar["backgroundColor"] = base_color
+    return orjson.dumps(card)
+
+# 每個風險等級預先套好固定欄位並序列化，orjson.loads 複製骨架比 copy.deepcopy 快數倍
+_FLEX_TIER_TEMPLATES_JSON = {status: _build_tier_template(*tier) for status, tier in RISK_TIERS.items()}
+
+def get_flex_card(result, trend_text, trend_color, seed_hash):
+    room, n, r, b = result.room, result.n, result.r, result.b
+    rng = random.Random(seed_hash)  # 獨立亂數源，不動全域 random 狀態 (背景執行緒共用)
+    if n > 250 or r > 120: status = "high"
+    elif n > 150 or r > 110: status = "mid"
+    else: status = "low"
     
-    current_tip = random.choice(tips)
-    random.seed(None)
+    combo = rng.choice(rng.choice(SYMBOL_COMBOS))
+    current_tip = rng.choice(TIP_TEMPLATES[status]).format(combo=combo)
     
-    return {
-        "type": "bubble",
-        "header": {"type": "box", "layout": "vertical", "contents": [{"type": "text", "text": f"賽特 {room} 房 趨勢分析", "color": "#FFFFFF", "weight": "bold"}], "backgroundColor": base_color},
-        "body": {"type": "box", "layout": "vertical", "spacing": "md", "contents": [
-            {"type": "text", "text": label, "size": "xl", "weight": "bold", "color": base_color},
-            {"type": "box", "layout": "vertical", "margin": "md", "contents": [
-                {"type": "text", "text": "風險指數", "size": "xs", "color": "#888888"},
-                {"type": "box", "layout": "vertical", "backgroundColor": "#EEEEEE", "height": "8px", "margin": "sm", "cornerRadius": "4px", "contents": [
-                    {"type": "box", "layout": "vertical", "width": risk_percent, "backgroundColor": base_color, "height": "8px", "cornerRadius": "4px", "contents": []}
-                ]}
-            ]},
-            {"type": "text", "text": trend_text, "size": "sm", "color": trend_color, "weight": "bold"},
-            {"type": "separator"},
-            {"type": "box", "layout": "vertical", "spacing": "sm", "contents": [
-                {"type": "text", "text": f"📍 未開轉數：{n}", "size": "md", "weight": "bold"},
-                {"type": "text", "text": f"📈 今日 RTP：{r}%", "size": "md", "weight": "bold"},
-                {"type": "text", "text": f"💰 今日總下注：{b:,.2f}", "size": "md", "weight": "bold"}
-            ]},
-            {"type": "box", "layout": "vertical", "margin": "md", "backgroundColor": "#F8F8F8", "paddingAll": "10px", "contents": [
-                {"type": "text", "text": "🔮 AI 進場訊號", "weight": "bold", "size": "xs", "color": "#555555"},
-                {"type": "text", "text": f"{current_tip}", "size": "sm", "wrap": True}
-            ]}
-        ]}
-    }
+    card = orjson.loads(_FLEX_TIER_TEMPLATES_JSON[status])
+    body = card["body"]["contents"]
+    card["header"]["contents"][0]["text"] = f"賽特 {room} 房 趨勢分析"
+    body[2]["text"] = trend_text; body[2]["color"] = trend_color
+    stats = body[4]["contents"]
+    stats[0]["text"] = f"📍 未開轉數：{n}"
+    stats[1]["text"] = f"📈 今日 RTP：{r}%"
+    stats[2]["text"] = f"💰 今日總下注：{b:,.2f}"
+    body[5]["contents"][1]["text"] = current_tip
+    return card
+
+# 卡片內容由 seed_hash 決定 (同輸入必得同卡片)，快取驗證後的 FlexContainer 省去重複的 from_dict 解析
+@lru_cache(maxsize=256)
+def get_flex_container(result, trend_text, trend_color, seed_hash):
+    return FlexContainer.from_dict(get_flex_card(result, trend_text, trend_color, seed_hash))
 
 def get_trending_report():
+    with _report_lock:
+        cached = REPORT_CACHE.get("hot")
+    if cached is not None: return cached
     try:
-        res = supabase.table("usage_logs").select("room_id, rtp_value").order("created_at", desc=True).limit(100).execute()
+        res = execute_with_retry(supabase.table("usage_logs").select("room_id, rtp_value").order("created_at", desc=True).limit(100))
         if not res.data: return "目前暫無數據，請先傳送截圖。"
         rooms = {}
         for item in res.data:
@@ -119,222 +312,256 @@ def get_trending_report():
             if rid not in rooms or rtp > rooms[rid]: rooms[rid] = rtp
         sorted_rooms = sorted(rooms.items(), key=lambda x: x[1], reverse=True)[:5]
         report_text = "🔥 戰神賽特｜即時熱門排行：\n"
-        medals = ["🥇", "🥈", "🥉", "▫️", "▫️"]
         for i, (rid, rtp) in enumerate(sorted_rooms):
-            report_text += f"{medals[i]} 房號: {rid} | RTP: {rtp}%\n"
-        return report_text + "\n💡 數據由全體用戶貢獻。"
+            report_text += f"{RANK_MEDALS[i]} 房號: {rid} | RTP: {rtp}%\n"
+        report_text += "\n💡 數據由全體用戶貢獻。"
+        with _report_lock:
+            REPORT_CACHE["hot"] = report_text
+        return report_text
     except Exception as e:
         logger.error(f"Report Error: {e}")
         return f"戰報生成錯誤: {str(e)}"
 
-def sync_image_analysis(user_id, message_id, base_limit):
-    with ApiClient(configuration) as api_client:
-        blob_api = MessagingApiBlob(api_client)
+def run_ocr(img_bytes):
+    img_key = hashlib.blake2b(img_bytes, digest_size=16).digest()
+    with _ocr_lock:
+        txt = OCR_CACHE.get(img_key)
+    if txt is not None: return txt
+
+    # 多金鑰輪替
+    for current_key in OCR_KEYS:
+        payload = {
+            'apikey': current_key,
+            'language': 'cht',
+            'isOverlayRequired': False,
+            'scale': True,
+            'OCREngine': 2
+        }
+        files = {'filename': ('image.jpg', img_bytes, 'image/jpeg')}
         try:
-            # 1. 取得圖片內容
-            img_bytes = blob_api.get_message_content(message_id)
-            
-            # 2. 呼叫 OCR.space API (加入多金鑰輪替邏輯)
-            txt = ""
-            success = False
-            for current_key in OCR_KEYS:
-                payload = {
-                    'apikey': current_key,
-                    'language': 'cht',
-                    'isOverlayRequired': False,
-                    'scale': True,
-                    'OCREngine': 2
-                }
-                files = {'filename': ('image.jpg', img_bytes, 'image/jpeg')}
-                try:
-                    ocr_res = requests.post('https://api.ocr.space/parse/image', files=files, data=payload, timeout=15)
-                    ocr_result = ocr_res.json()
-                    if ocr_result.get("OCRExitCode") == 1:
-                        txt = ocr_result["ParsedResults"][0]["ParsedText"]
-                        success = True
-                        break # 辨識成功，跳出金鑰輪替
-                    else:
-                        logger.warning(f"OCR Key Failed: {current_key[:5]}... Error: {ocr_result.get('ErrorMessage')}")
-                except Exception as e:
-                    logger.error(f"OCR Request Error with Key {current_key[:5]}: {e}")
-            
-            if not success:
-                return [TextMessage(text="❌ 辨識服務暫時不可用，請稍後再試。")]
+            ocr_res = OCR_SESSION.post('https://api.ocr.space/parse/image', files=files, data=payload, timeout=15)
+            ocr_result = ocr_res.json()
+            if ocr_result.get("OCRExitCode") == 1:
+                txt = ocr_result["ParsedResults"][0]["ParsedText"]
+                with _ocr_lock:
+                    OCR_CACHE[img_key] = txt
+                return txt # 辨識成功，跳出金鑰輪替
+            else:
+                logger.warning(f"OCR Key Failed: {current_key[:5]}... Error: {ocr_result.get('ErrorMessage')}")
+        except Exception as e:
+            logger.error(f"OCR Request Error with Key {current_key[:5]}: {e}")
+    return None
 
-            # --- 以下保留原始解析邏輯，完全不動 ---
-            lines = [l.strip() for l in txt.split('\n') if l.strip()]
-            
-            room = "未知"
-            n = 0
-            r, b = 0.0, 0.0
-
-            n_m = re.search(r"未開\s*(\d+)", txt)
-            if n_m: n = int(n_m.group(1))
-
-            for i, line in enumerate(lines):
-                if "機台" in line:
-                    room_m = re.search(r"(\d{3,4})", line)
-                    if room_m:
-                        room = room_m.group(1)
-                        break
-                    elif i > 0:
-                        room_prev = re.search(r"(\d{3,4})", lines[i-1])
-                        if room_prev:
-                            room = room_prev.group(1)
-                            break
-            
-            if room == "未知":
-                fallback_room = re.search(r"(\d{3,4})\s*機台", txt)
-                if fallback_room: room = fallback_room.group(1)
-
-            for i, line in enumerate(lines):
-                if b == 0.0 and ("總下注" in line or "下注額" in line):
-                    for j in range(i, min(i+8, len(lines))):
-                        amt_m = re.search(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2}))", lines[j])
-                        if amt_m:
-                            b = float(amt_m.group(1).replace(',', ''))
-                            break
-                            
-                if r == 0.0 and "得分率" in line:
-                    for j in range(i, min(i+8, len(lines))):
-                        rtp_m = re.search(r"(\d+\.\d+)\s*%", lines[j])
-                        if rtp_m:
-                            r = float(rtp_m.group(1))
-                            break
-
-            if b == 0.0 or r == 0.0:
-                for i, line in enumerate(lines):
-                    if "今日" in line or "今" in line:
-                        scope = " ".join(lines[i:i+15])
-                        if b == 0.0:
-                            amt_m = re.findall(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2}))", scope)
-                            if amt_m: b = float(amt_m[0].replace(',', ''))
-                        if r == 0.0:
-                            rtp_m = re.findall(r"(\d+\.\d+)\s*%", scope)
-                            if rtp_m: r = float(rtp_m[0])
-                        break
-
-            if r <= 0: return [TextMessage(text="❓ 辨識失敗，請確保彈出視窗數據清晰無遮擋。")]
-
-            today_str = get_tz_now().strftime('%Y-%m-%d')
-            data_hash = f"{room}_{b:.2f}" 
+def sync_image_analysis(user_id, message_id, base_limit, today_str):
+    try:
+        # 1. 取得圖片內容 (handle_message 已確認開通與額度才會走到這裡)
+        img_bytes = BLOB_API.get_message_content(message_id)
             
-            dup_check = supabase.table("usage_logs").select("id").eq("line_user_id", user_id).eq("used_at", today_str).eq("data_hash", data_hash).execute()
-            if dup_check.data:
-                return [TextMessage(text="⚠️ 此截圖已分析過，請勿重複傳送以免浪費額度。", quick_reply=get_main_menu())]
+        # 2. 呼叫 OCR.space API (同一張圖直接取快取)
+        txt = run_ocr(img_bytes)
+        if txt is None:
+            return [TextMessage(text="❌ 辨識服務暫時不可用，請稍後再試。")]
+
+        result = parse_seth_ocr(txt)
+        if result.r <= 0: return [TextMessage(text="❓ 辨識失敗，請確保彈出視窗數據清晰無遮擋。")]
 
-            m_res = supabase.table("members").select("extra_limit").eq("line_user_id", user_id).maybe_single().execute()
-            current_extra = m_res.data.get("extra_limit", 0) if m_res and m_res.data else 0
+        data_hash = make_data_hash(result.room, result.b)
             
-            is_extra_use = False
-            if current_extra > 0:
-                current_extra -= 1
-                supabase.table("members").update({"extra_limit": current_extra}).eq("line_user_id", user_id).execute()
-                is_extra_use = True
+        # 額度檢查 + 寫入紀錄 (重複截圖由 ON CONFLICT 擋下) + 今日次數 + 同房上一筆 RTP，一次 RPC 完成
+        p_limit = None if user_id == ADMIN_LINE_ID else base_limit
+        # 寫入重送可能撞上第一次已寫入的同一筆而被當成重複截圖，只重試確定沒送出的失敗
+        log_res = execute_with_retry(supabase.rpc("log_and_analyze", {"p_uid": user_id, "p_today": today_str, "p_hash": data_hash, "p_rtp": result.r, "p_room": result.room, "p_limit": p_limit}), idempotent=False)
+        log_row = log_res.data[0] if log_res.data else {}
+        if log_row.get("over_limit"):
+            # 其他 worker 已用掉額度，本程序快取落後；以資料庫為準
+            set_base_used_today(user_id, today_str, log_row.get("base_used") or 0)
+            invalidate_member(user_id)
+            return [TextMessage(text=get_quota_exhausted_text(base_limit), quick_reply=get_main_menu())]
+        if not log_row.get("inserted"):
+            return [TextMessage(text="⚠️ 此截圖已分析過，請勿重複傳送以免浪費額度。", quick_reply=get_main_menu())]
 
-            supabase.table("usage_logs").insert({"line_user_id": user_id, "used_at": today_str, "rtp_value": r, "room_id": room, "data_hash": data_hash}).execute()
+        # 有剩餘額外點數時先扣點數 (RPC 內原子扣除)
+        is_extra_use = bool(log_row.get("used_extra"))
+        current_extra = log_row.get("extra_left") or 0
+        if is_extra_use: invalidate_member(user_id)
 
-            trend_text, trend_color = "🆕 今日首次分析", "#AAAAAA"
-            try:
-                last_record = supabase.table("usage_logs").select("rtp_value").eq("room_id", room).order("created_at", desc=True).limit(2).execute()
-                if len(last_record.data) > 1:
-                    diff = r - float(last_record.data[1]['rtp_value'])
-                    if diff > 0.01: trend_text, trend_color = f"🔥 趨勢升溫 (+{diff:.2f}%)", "#D50000"
-                    elif diff < -0.01: trend_text, trend_color = f"❄️ 數據冷卻 ({diff:.2f}%)", "#1976D2"
-                    else: trend_text, trend_color = "➡️ 數據平穩", "#555555"
-            except: pass
-
-            count_res = supabase.table("usage_logs").select("id", count="exact").eq("line_user_id", user_id).eq("used_at", today_str).execute()
-            total_used_today = count_res.count or 0
-            effective_base_used = total_used_today - 1 if is_extra_use else total_used_today
-            remain_base = max(0, base_limit - effective_base_used)
-            total_remaining = remain_base + current_extra
-
-            return [
-                FlexMessage(alt_text="賽特 AI 分析", contents=FlexContainer.from_dict(get_flex_card(room, n, r, b, trend_text, trend_color, data_hash))),
-                TextMessage(text=f"📊 剩餘總額度：{total_remaining} 次\n(每日基礎：{remain_base} + 額外點數：{current_extra})", quick_reply=get_main_menu())
-            ]
-        except Exception as e:
-            logger.error(f"Logic Error: {e}")
-            return [TextMessage(text=f"分析失敗: {str(e)}")]
+        trend_text, trend_color = "🆕 今日首次分析", "#AAAAAA"
+        if log_row.get("prev_rtp") is not None:
+            diff = result.r - float(log_row["prev_rtp"])
+            if diff > 0.01: trend_text, trend_color = f"🔥 趨勢升溫 (+{diff:.2f}%)", "#D50000"
+            elif diff < -0.01: trend_text, trend_color = f"❄️ 數據冷卻 ({diff:.2f}%)", "#1976D2"
+            else: trend_text, trend_color = "➡️ 數據平穩", "#555555"
+
+        base_used_today = log_row.get("base_used") or 0
+        set_base_used_today(user_id, today_str, base_used_today)
+        remain_base = max(0, base_limit - base_used_today)
+        total_remaining = remain_base + current_extra
+
+        return [
+            FlexMessage(alt_text="賽特 AI 分析", contents=get_flex_container(result, trend_text, trend_color, data_hash)),
+            TextMessage(text=f"📊 剩餘總額度：{total_remaining} 次\n(每日基礎：{remain_base} + 額外點數：{current_extra})", quick_reply=get_main_menu())
+        ]
+    except Exception as e:
+        logger.error(f"Logic Error: {e}")
+        return [TextMessage(text=f"分析失敗: {str(e)}")]
+
+def fire_and_forget(fn, *args):
+    def _log_error(future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"Background Error in {getattr(fn, '__name__', fn)}: {future.exception()}")
+    EXECUTOR.submit(fn, *args).add_done_callback(_log_error)
+
+def submit_application(user_id):
+    try:
+        execute_with_retry(supabase.table("members").upsert({"line_user_id": user_id, "status": "pending"}, on_conflict="line_user_id"))
+    except Exception:
+        invalidate_member(user_id)  # 寫入失敗時撤回快取，下次可重新申請
+        # 使用者已收到「申請已送出」，改推播告知失敗，不然只有伺服器日誌知道
+        LINE_API.push_message(PushMessageRequest(to=user_id, messages=[TextMessage(text="❌ 申請失敗，請重新送出「我要開通」。", quick_reply=get_main_menu())]))
+        raise
+    if ADMIN_LINE_ID: LINE_API.push_message(PushMessageRequest(to=ADMIN_LINE_ID, messages=[FlexMessage(alt_text="新申請", contents=FlexContainer.from_dict(get_admin_approve_flex(user_id)))]))
+
+def run_image_analysis(user_id, message_id, reply_token, base_limit, today_str):
+    result_messages = sync_image_analysis(user_id, message_id, base_limit, today_str)
+    try:
+        LINE_API.reply_message(ReplyMessageRequest(reply_token=reply_token, messages=result_messages))
+    except Exception as e:
+        # reply token 已失效時改用 push 補送
+        logger.warning(f"Reply Failed, fallback to push: {e}")
+        try: LINE_API.push_message(PushMessageRequest(to=user_id, messages=result_messages))
+        except Exception as e: logger.error(f"Push Error: {e}")
+
+# 健康檢查 / 保活探測，不經過任何外部服務
+@app.route("/", methods=["GET", "HEAD"])
+def health():
+    return "OK"
 
-@app.route("/callback", methods=["POST"])
+@app.route("/callback", methods=["POST"], strict_slashes=False)
 def callback():
     signature = request.headers.get("X-Line-Signature", "")
+    # 沒有簽章的請求 (探測/掃描) 直接拒絕，不讀取也不解碼 body
+    if not signature: abort(400)
     body = request.get_data(as_text=True)
     try: handler.handle(body, signature)
     except InvalidSignatureError: abort(400)
     return "OK"
 
+def handle_admin_command(event, msg):
+    if msg.startswith("#核准_"):
+        # 支援一次核准多人：#核准_normal_uid1_uid2 (或以空白分隔)，可多行混合不同等級
+        by_level = {}
+        for line in msg.splitlines():
+            p = line.strip().split("_", 2)
+            if len(p) == 3 and p[0] == "#核准":
+                by_level.setdefault(p[1], []).extend(p[2].replace("_", " ").split())
+        approved = []
+        for level, targets in by_level.items():
+            if not targets: continue
+            supabase.table("members").update({"status": "approved", "member_level": level}).in_("line_user_id", targets).execute()
+            approved.extend(targets)
+        if approved:
+            invalidate_member(*approved)
+            # 通知用戶與回覆管理員互不相依，通知丟背景送出
+            fire_and_forget(LINE_API.multicast, MulticastRequest(to=approved, messages=[TextMessage(text="🎉 您的帳號已核准開通！")]))
+            LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"✅ 已核准 {len(approved)} 位。")]))
+        return True
+    if msg.startswith("#加次數_"):
+        p = msg.split("_")
+        if len(p) == 3:
+            try:
+                cur = supabase.table("members").select("extra_limit").eq("line_user_id", p[2]).maybe_single().execute()
+                # 查無此人時 maybe_single 回傳 None
+                if not (cur and cur.data):
+                    LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"❓ 查無此用戶：{p[2]}")]))
+                    return True
+                new_val = (cur.data.get("extra_limit") or 0) + int(p[1])
+                supabase.table("members").update({"extra_limit": new_val}).eq("line_user_id", p[2]).execute()
+                invalidate_member(p[2])
+                fire_and_forget(LINE_API.push_message, PushMessageRequest(to=p[2], messages=[TextMessage(text=f"🎁 管理員已為您增加 {p[1]} 次臨時額度！")]))
+                LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"✅ 已增加額度。")]))
+            except (ValueError, APIError, httpx.HTTPError, ApiException) as e:
+                logger.error(f"Add Quota Error: {e}")
+        return True
+    return False
+
 @handler.add(MessageEvent)
 def handle_message(event):
+    if is_seen_message(event.message.id): return
+    # 處理失敗時 /callback 回 500、LINE 會重送；移除紀錄，重送才不會被當成重複擋掉
+    try: dispatch_message(event)
+    except Exception:
+        forget_message(event.message.id)
+        raise
+
+def dispatch_message(event):
     user_id = event.source.user_id
-    with ApiClient(configuration) as api_client:
-        line_api = MessagingApi(api_client)
-        is_admin = (user_id == ADMIN_LINE_ID)
-        user_data = None
-        base_limit = 15; extra_limit = 0; is_approved = is_admin
+    today_str = get_today_str()  # 每個事件只算一次，往下傳遞
+    is_admin = (user_id == ADMIN_LINE_ID)
+    # 管理指令不需要管理員自己的會員資料，先處理掉省一次查詢
+    if is_admin and event.message.type == "text" and handle_admin_command(event, event.message.text.strip()): return
+    user_data = None
+    base_limit = 15; extra_limit = 0; is_approved = is_admin
 
-        try:
-            m_res = supabase.table("members").select("*").eq("line_user_id", user_id).maybe_single().execute()
-            if m_res and m_res.data:
-                user_data = m_res.data
-                if user_data.get("status") == "approved":
-                    is_approved = True
-                    base_limit = 50 if user_data.get("member_level") == "vip" else 15
-                    extra_limit = user_data.get("extra_limit", 0)
-        except: pass
-
-        total_limit = base_limit + extra_limit
-
-        if event.message.type == "text":
-            msg = event.message.text.strip()
-            if is_admin:
-                if msg.startswith("#核准_"):
-                    p = msg.split("_")
-                    if len(p) == 3:
-                        supabase.table("members").update({"status": "approved", "member_level": p[1]}).eq("line_user_id", p[2]).execute()
-                        line_api.push_message(PushMessageRequest(to=p[2], messages=[TextMessage(text="🎉 您的帳號已核准開通！")]))
-                        line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="✅ 已核准。")]))
-                    return
-                if msg.startswith("#加次數_"):
-                    p = msg.split("_")
-                    if len(p) == 3:
-                        try:
-                            cur = supabase.table("members").select("extra_limit").eq("line_user_id", p[2]).maybe_single().execute()
-                            new_val = (cur.data.get("extra_limit", 0) if cur.data else 0) + int(p[1])
-                            supabase.table("members").update({"extra_limit": new_val}).eq("line_user_id", p[2]).execute()
-                            line_api.push_message(PushMessageRequest(to=p[2], messages=[TextMessage(text=f"🎁 管理員已為您增加 {p[1]} 次臨時額度！")]))
-                            line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"✅ 已增加額度。")]))
-                        except: pass
-                    return
-
-            if msg == "熱門戰報":
-                line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=get_trending_report(), quick_reply=get_main_menu())]))
-            elif msg == "我的額度":
-                today_str = get_tz_now().strftime('%Y-%m-%d')
-                count_res = supabase.table("usage_logs").select("id", count="exact").eq("line_user_id", user_id).eq("used_at", today_str).execute()
-                used_today = count_res.count or 0
-                remain_total = max(0, total_limit - used_today)
-                line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"📊 剩餘總額度：{remain_total} 次\n(基礎: {base_limit} + 額外: {extra_limit})", quick_reply=get_main_menu())]))
-            elif msg == "我要開通":
-                if user_data and user_data.get("status") == "approved":
-                    line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="✅ 您的帳號已開通。")]))
-                elif user_data and user_data.get("status") == "pending":
-                    line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="⏳ 審核中，請截圖 ID 給管理員。")]))
-                else:
-                    supabase.table("members").upsert({"line_user_id": user_id, "status": "pending"}, on_conflict="line_user_id").execute()
-                    if ADMIN_LINE_ID: line_api.push_message(PushMessageRequest(to=ADMIN_LINE_ID, messages=[FlexMessage(alt_text="新申請", contents=FlexContainer.from_dict(get_admin_approve_flex(user_id)))]))
-                    line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"✅ 申請已送出！\n您的 ID：\n{user_id}\n請傳給管理員 LINE:adong8989。")]))
+    # 查詢失敗視同未開通；只攔連線/API 錯誤，程式錯誤照常拋出
+    try: user_data = get_member(user_id, today_str)
+    except (APIError, httpx.HTTPError) as e: logger.error(f"Member Lookup Error: {e}")
+    if user_data and user_data.get("status") == "approved":
+        is_approved = True
+        base_limit = 50 if user_data.get("member_level") == "vip" else 15
+        extra_limit = user_data.get("extra_limit") or 0
+
+    if event.message.type == "text":
+        msg = event.message.text.strip()
+        if msg == "熱門戰報":
+            LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=get_trending_report(), quick_reply=get_main_menu())]))
+        elif msg == "我的額度":
+            try: base_used = get_base_used_today(user_id, today_str)
+            except (APIError, httpx.HTTPError) as e:
+                logger.error(f"Quota Lookup Error: {e}")
+                return LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="❌ 額度查詢暫時不可用，請稍後再試。", quick_reply=get_main_menu())]))
+            remain_total = max(0, base_limit - base_used) + extra_limit
+            LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"📊 剩餘總額度：{remain_total} 次\n(基礎: {base_limit} + 額外: {extra_limit})", quick_reply=get_main_menu())]))
+        elif msg == "我要開通":
+            if user_data and user_data.get("status") == "approved":
+                LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="✅ 您的帳號已開通。")]))
+            elif user_data and user_data.get("status") == "pending":
+                LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="⏳ 審核中，請截圖 ID 給管理員。")]))
             else:
-                line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="🔮 賽特 AI 分析系統：請傳送截圖。", quick_reply=get_main_menu())]))
+                # 寫入申請與通知管理員都不在使用者的回覆路徑上，丟背景送出；快取先標記審核中避免重複申請
+                with _member_lock:
+                    MEMBER_CACHE[user_id] = {"status": "pending", "member_level": None, "extra_limit": 0}
+                fire_and_forget(submit_application, user_id)
+                LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=f"✅ 申請已送出！\n您的 ID：\n{user_id}\n請傳給管理員 LINE:adong8989。")]))
+        else:
+            LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="🔮 賽特 AI 分析系統：請傳送截圖。", quick_reply=get_main_menu())]))
         
-        elif event.message.type == "image":
-            if not is_approved:
-                return line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="⚠️ 請先申請開通管理員 LINE:adong8989。")]))
-            
-            result_messages = sync_image_analysis(user_id, event.message.id, base_limit)
-            line_api.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=result_messages))
+    elif event.message.type == "image":
+        if not is_approved:
+            return LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text="⚠️ 請先申請開通管理員 LINE:adong8989。")]))
+        # 額度用完就不必下載、OCR 與寫入；通過檢查才開始下載 (次數通常已由 member_context 預熱在快取中)
+        # 基礎次數用完且無剩餘點數才擋 (log_and_analyze 亦以同規則把關)；只計基礎次數，點數先扣或後扣都成立
+        # 次數查詢失敗就略過預檢，由 log_and_analyze 以資料庫為準把關
+        over_limit = False
+        if not is_admin and extra_limit <= 0:
+            try: over_limit = get_base_used_today(user_id, today_str) >= base_limit
+            except (APIError, httpx.HTTPError) as e: logger.error(f"Quota Precheck Error: {e}")
+        if over_limit:
+            return LINE_API.reply_message(ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=get_quota_exhausted_text(base_limit), quick_reply=get_main_menu())]))
+
+        EXECUTOR.submit(run_image_analysis, user_id, event.message.id, event.reply_token, base_limit, today_str)
+
+def warm_up_connections():
+    # 啟動時先對各服務打一次輕量請求，TLS 握手不必由第一位使用者負擔
+    # 只在 worker 啟動 (gunicorn.conf.py) 或直接執行時呼叫，單純 import 不會連外
+    tasks = (
+        lambda: supabase.table("members").select("line_user_id").limit(1).execute(),
+        LINE_API.get_bot_info,
+        lambda: OCR_SESSION.head("https://api.ocr.space/parse/image", timeout=5),
+    )
+    for f in [EXECUTOR.submit(t) for t in tasks]:
+        try: f.result()
+        except Exception as e: logger.warning(f"Warmup Error: {e}")
 
 if __name__ == "__main__":
+    threading.Thread(target=warm_up_connections, daemon=True).start()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 10000)))
@@ -0,0 +1,26 @@
+import itertools
+
+# 賽特盤面符號池 (名稱, 最大顆數)
+SYMBOL_POOL = (
+    ("眼睛", 6), ("弓箭", 6), ("權杖蛇", 6), ("彎刀", 6), ("紅寶石", 6),
+    ("藍寶石", 6), ("綠寶石", 6), ("黃寶石", 6), ("紫寶石", 6), ("聖甲蟲", 3),
+)
+
+# 所有有序兩兩組合預先展開，抽組合只需一次 choice；與 random.sample 相同，兩個符號誰先出現都有可能
+SYMBOL_PAIRS = tuple(itertools.permutations(SYMBOL_POOL, 2))
+
+# 每組符號的所有顆數文字也預先展開：先抽組合再抽顆數，機率與逐一 randint 相同
+SYMBOL_COMBOS = tuple(
+    tuple(f"{n1}{i}顆、{n2}{j}顆" for i in range(1, c1 + 1) for j in range(1, c2 + 1))
+    for (n1, c1), (n2, c2) in SYMBOL_PAIRS
+)
+
+# AI 進場訊號文案 (依風險等級)，{combo} 於抽中後才填入
+TIP_TEMPLATES = {
+    "high": ("❌ 盤面較硬，雖然出現「{combo}」，但分布太散容易咬分，建議換房。", "⚠️ 偵測到回收訊號，目前「{combo}」氣場不足，請小心操作。"),
+    "mid": ("⚖️ 盤面拉鋸中，若看到「{combo}」頻繁出現，可以考慮小試幾轉。", "🔍 觀察中：目前「{combo}」頻率尚可，建議平注守好。"),
+    "low": ("✅ 氣場極強！盤面出現「{combo}」組合，大噴發機率攀升。", "🔥 訊號亮起！出現「{combo}」帶動，大獎可能就在最近幾轉。"),
+}
+
+# 熱門戰報名次圖示
+RANK_MEDALS = ("🥇", "🥈", "🥉", "▫️", "▫️")
@@ -0,0 +1,7 @@
+# gunicorn 啟動時會自動讀取工作目錄下的 gunicorn.conf.py
+import threading
+
+def post_worker_init(worker):
+    # 每個 worker 載入 app 後各自預熱自己的連線池 (import app 本身不連外)
+    from app import warm_up_connections
+    threading.Thread(target=warm_up_connections, daemon=True).start()
@@ -0,0 +1,73 @@
+# 賽特彈出視窗的 OCR 文字解析，不依賴 LINE / Supabase 設定，可單獨 import 測試
+import re
+from dataclasses import dataclass
+
+_NOCOMMA = str.maketrans('', '', ',')  # 金額千分位移除表
+
+# OCR 解析用正規式 (模組載入時編譯一次)
+RE_UNOPEN = re.compile(r"未開 ?(\d+)")
+RE_ROOM = re.compile(r"(\d{3,4})")
+RE_ROOM_FALLBACK = re.compile(r"(\d{3,4}) ?機台")
+RE_AMOUNT = re.compile(r"(\d{1,3}(?:,\d{3})*(?:\.\d{2}))")
+RE_RTP = re.compile(r"(\d+\.\d+)\s*%")
+
+@dataclass(slots=True, frozen=True)
+class SethResult:
+    room: str
+    n: int
+    b: float
+    r: float
+
+def parse_seth_ocr(txt):
+    lines = [l for l in map(str.strip, txt.split('\n')) if l]  # 每行只 strip 一次
+            
+    room = "未知"
+    n = 0
+    r, b = 0.0, 0.0
+
+    # 空白/換行一次壓成單一空格，全文正規式就不必再用 \s* 回溯
+    flat = " ".join(txt.split())
+    n_m = RE_UNOPEN.search(flat)
+    if n_m: n = int(n_m.group(1))
+
+    # 單次走訪：房號、下注額、得分率、「今日」區塊位置一起找
+    today_idx = -1
+    for i, line in enumerate(lines):
+        if room == "未知" and "機台" in line:
+            room_m = RE_ROOM.search(line) or (RE_ROOM.search(lines[i-1]) if i > 0 else None)
+            if room_m: room = room_m.group(1)
+
+        if b == 0.0 and ("總下注" in line or "下注額" in line):
+            for j in range(i, min(i+8, len(lines))):
+                if "." not in lines[j]: continue  # 金額必有小數點，先用字串判斷略過
+                amt_m = RE_AMOUNT.search(lines[j])
+                if amt_m:
+                    b = float(amt_m.group(1).translate(_NOCOMMA))
+                    break
+                            
+        if r == 0.0 and "得分率" in line:
+            for j in range(i, min(i+8, len(lines))):
+                if "%" not in lines[j]: continue
+                rtp_m = RE_RTP.search(lines[j])
+                if rtp_m:
+                    r = float(rtp_m.group(1))
+                    break
+
+        if today_idx < 0 and "今" in line: today_idx = i
+        if room != "未知" and b and r: break
+
+    if room == "未知":
+        fallback_room = RE_ROOM_FALLBACK.search(flat)
+        if fallback_room: room = fallback_room.group(1)
+
+    if (b == 0.0 or r == 0.0) and today_idx >= 0:
+        scope = " ".join(lines[today_idx:today_idx+15])
+        # 各取第一筆即可 (search 不建整串 findall 清單)；下注額照舊取區塊內第一個金額格式數字，RTP 在前時也一樣
+        if b == 0.0:
+            amt_m = RE_AMOUNT.search(scope)
+            if amt_m: b = float(amt_m.group(1).translate(_NOCOMMA))
+        if r == 0.0:
+            rtp_m = RE_RTP.search(scope)
+            if rtp_m: r = float(rtp_m.group(1))
+
+    return SethResult(room, n, b, r)
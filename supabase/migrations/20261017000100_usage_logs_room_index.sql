@@ -0,0 +1,8 @@
+-- 同房號上一筆 RTP 查詢：.eq("room_id", room).order("created_at", desc=True).limit(2)
+-- 舊資料若沒有 room_id，從 data_hash ("{room}_{b}") 回填
+update usage_logs
+   set room_id = split_part(data_hash, '_', 1)
+ where room_id is null and data_hash like '%\_%';
+
+create index if not exists usage_logs_room_created_idx
+    on usage_logs (room_id, created_at desc);
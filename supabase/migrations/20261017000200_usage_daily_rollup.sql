@@ -0,0 +1,28 @@
+-- 每人每日使用次數彙總，取代每次請求的 count(*)
+create table if not exists usage_daily (
+    line_user_id text not null,
+    used_at      date not null,
+    used_count   integer not null default 0,
+    primary key (line_user_id, used_at)
+);
+
+create or replace function bump_usage_daily() returns trigger
+language plpgsql as $$
+begin
+    insert into usage_daily (line_user_id, used_at, used_count)
+    values (new.line_user_id, new.used_at, 1)
+    on conflict (line_user_id, used_at)
+    do update set used_count = usage_daily.used_count + 1;
+    return new;
+end;
+$$;
+
+drop trigger if exists usage_logs_bump_daily on usage_logs;
+create trigger usage_logs_bump_daily
+    after insert on usage_logs
+    for each row execute function bump_usage_daily();
+
+-- 回填既有紀錄
+insert into usage_daily (line_user_id, used_at, used_count)
+select line_user_id, used_at, count(*) from usage_logs group by 1, 2
+on conflict (line_user_id, used_at) do update set used_count = excluded.used_count;
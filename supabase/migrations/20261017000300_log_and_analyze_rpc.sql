@@ -0,0 +1,29 @@
+-- 圖片分析一次往返：寫入 usage_logs，回傳今日次數與同房號上一筆 RTP
+create or replace function log_and_analyze(
+    p_uid   text,
+    p_today date,
+    p_hash  text,
+    p_rtp   double precision,
+    p_room  text
+) returns table (today_count integer, prev_rtp double precision)
+language plpgsql as $$
+declare
+    v_id usage_logs.id%type;
+begin
+    insert into usage_logs (line_user_id, used_at, rtp_value, room_id, data_hash)
+    values (p_uid, p_today, p_rtp, p_room, p_hash)
+    returning id into v_id;
+
+    return query
+    select
+        coalesce((select d.used_count from usage_daily d
+                   where d.line_user_id = p_uid and d.used_at = p_today), 0),
+        (select l.rtp_value::double precision from usage_logs l
+          where l.room_id = p_room and l.id <> v_id
+          order by l.created_at desc limit 1);
+end;
+$$;
+
+-- 重複截圖檢查：.eq(line_user_id).eq(used_at).eq(data_hash)
+create index if not exists usage_logs_user_day_hash_idx
+    on usage_logs (line_user_id, used_at, data_hash);
@@ -0,0 +1,25 @@
+-- data_hash 改為固定長度 md5 (hex)，由唯一索引保證同人同日不重複
+-- 舊格式 "{room}_{b}" 直接換算成新指紋 md5("{room}|{b}")，與 app.py make_data_hash 相同，上線當日的舊紀錄也擋得住重傳
+update usage_logs
+   set data_hash = md5(replace(data_hash, '_', '|'))
+ where data_hash like '%\_%';
+
+-- 若有歷史競態留下的重複資料 (含換算後才撞在一起的)，保留最早一筆，並從 usage_daily 扣回次數
+with removed as (
+    delete from usage_logs a
+     using usage_logs b
+     where a.line_user_id = b.line_user_id
+       and a.used_at = b.used_at
+       and a.data_hash = b.data_hash
+       and a.id > b.id
+    returning a.line_user_id, a.used_at
+)
+update usage_daily d
+   set used_count = d.used_count - r.n
+  from (select line_user_id, used_at, count(*) as n from removed group by 1, 2) r
+ where d.line_user_id = r.line_user_id
+   and d.used_at = r.used_at;
+
+drop index if exists usage_logs_user_day_hash_idx;
+create unique index if not exists usage_logs_user_day_hash_key
+    on usage_logs (line_user_id, used_at, data_hash);
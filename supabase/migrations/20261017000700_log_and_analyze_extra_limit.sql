@@ -0,0 +1,44 @@
+-- 額外點數扣除併入同一支 RPC：寫入成功才扣 1 點，原子更新避免併發重複扣點
+drop function if exists log_and_analyze(text, date, text, double precision, text);
+
+create function log_and_analyze(
+    p_uid   text,
+    p_today date,
+    p_hash  text,
+    p_rtp   double precision,
+    p_room  text
+) returns table (
+    inserted    boolean,
+    today_count integer,
+    prev_rtp    double precision,
+    used_extra  boolean,
+    extra_left  integer
+)
+language plpgsql as $$
+declare
+    v_id    usage_logs.id%type;
+    v_extra integer;
+begin
+    insert into usage_logs (line_user_id, used_at, rtp_value, room_id, data_hash)
+    values (p_uid, p_today, p_rtp, p_room, p_hash)
+    on conflict (line_user_id, used_at, data_hash) do nothing
+    returning id into v_id;
+
+    if v_id is not null then
+        update members set extra_limit = extra_limit - 1
+         where line_user_id = p_uid and extra_limit > 0
+        returning extra_limit into v_extra;
+    end if;
+
+    return query
+    select
+        v_id is not null,
+        coalesce((select d.used_count from usage_daily d
+                   where d.line_user_id = p_uid and d.used_at = p_today), 0),
+        (select l.rtp_value::double precision from usage_logs l
+          where l.room_id = p_room and l.id <> v_id and l.data_hash <> p_hash
+          order by l.created_at desc limit 1),
+        v_extra is not null,
+        coalesce(v_extra, 0);
+end;
+$$;
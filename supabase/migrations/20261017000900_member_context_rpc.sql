@@ -0,0 +1,20 @@
+-- 會員資料 + 今日使用次數一次取回 (快取未命中時使用)
+create or replace function member_context(p_uid text, p_today date)
+returns table (
+    found        boolean,
+    status       text,
+    member_level text,
+    extra_limit  integer,
+    used_today   integer
+)
+language sql stable as $$
+    select
+        m.line_user_id is not null,
+        m.status::text,
+        m.member_level::text,
+        m.extra_limit::integer,
+        coalesce((select d.used_count from usage_daily d
+                   where d.line_user_id = p_uid and d.used_at = p_today), 0)
+    from (select 1) as one
+    left join members m on m.line_user_id = p_uid;
+$$;
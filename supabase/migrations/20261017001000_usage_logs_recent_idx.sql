@@ -0,0 +1,4 @@
+-- 熱門戰報：order by created_at desc limit 100，只讀 room_id / rtp_value
+-- 涵蓋索引可直接 index-only scan，不必排序整張 usage_logs
+create index if not exists usage_logs_created_cover_idx
+    on usage_logs (created_at desc) include (room_id, rtp_value);
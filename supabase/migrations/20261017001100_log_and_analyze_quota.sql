@@ -0,0 +1,66 @@
+-- 額度檢查併入 log_and_analyze：先用每日基礎次數，超過才扣額外點數；額度用完不寫入
+-- p_limit 為 null 時不限次數 (管理員)
+drop function if exists log_and_analyze(text, date, text, double precision, text);
+
+create function log_and_analyze(
+    p_uid   text,
+    p_today date,
+    p_hash  text,
+    p_rtp   double precision,
+    p_room  text,
+    p_limit integer default null
+) returns table (
+    inserted    boolean,
+    today_count integer,
+    prev_rtp    double precision,
+    used_extra  boolean,
+    extra_left  integer,
+    over_limit  boolean
+)
+language plpgsql as $$
+declare
+    v_id    usage_logs.id%type;
+    v_used  integer;
+    v_extra integer;
+    v_left  integer;
+begin
+    -- 鎖住會員列，同一用戶的併發分析依序檢查額度
+    select m.extra_limit into v_extra
+      from members m
+     where m.line_user_id = p_uid
+       for update;
+
+    select coalesce((select d.used_count from usage_daily d
+                      where d.line_user_id = p_uid and d.used_at = p_today), 0)
+      into v_used;
+
+    if p_limit is not null and v_used >= p_limit and coalesce(v_extra, 0) <= 0 then
+        return query select false, v_used, null::double precision, false, 0, true;
+        return;
+    end if;
+
+    insert into usage_logs (line_user_id, used_at, rtp_value, room_id, data_hash)
+    values (p_uid, p_today, p_rtp, p_room, p_hash)
+    on conflict (line_user_id, used_at, data_hash) do nothing
+    returning id into v_id;
+
+    if v_id is not null and p_limit is not null and v_used >= p_limit then
+        update members set extra_limit = extra_limit - 1
+         where line_user_id = p_uid and extra_limit > 0
+        returning extra_limit into v_left;
+    end if;
+
+    return query
+    select
+        v_id is not null,
+        coalesce((select d.used_count from usage_daily d
+                   where d.line_user_id = p_uid and d.used_at = p_today), 0),
+        (select l.rtp_value::double precision from usage_logs l
+          where l.room_id = p_room and l.used_at = p_today
+            and l.id <> v_id and l.data_hash <> p_hash
+          order by l.created_at desc limit 1),
+        v_left is not null,
+        coalesce(v_left, v_extra, 0),
+        false;
+end;
+$$;
@@ -0,0 +1,98 @@
+-- 額度只看「基礎次數用了幾次」：used_count 含使用額外點數的次數，另記 extra_used 才能扣掉
+-- 基礎已用 = used_count - extra_used，與額外點數先扣或後扣無關
+-- 歷史資料沒有記錄哪幾次用了額外點數，回填為 0 (只影響上線當日已用過點數的用戶)
+alter table usage_daily add column if not exists extra_used integer not null default 0;
+
+drop function if exists member_context(text, date);
+
+create function member_context(p_uid text, p_today date)
+returns table (
+    found        boolean,
+    status       text,
+    member_level text,
+    extra_limit  integer,
+    base_used    integer
+)
+language sql stable as $$
+    select
+        m.line_user_id is not null,
+        m.status::text,
+        m.member_level::text,
+        m.extra_limit::integer,
+        coalesce((select d.used_count - d.extra_used from usage_daily d
+                   where d.line_user_id = p_uid and d.used_at = p_today), 0)
+    from (select 1) as one
+    left join members m on m.line_user_id = p_uid;
+$$;
+
+drop function if exists log_and_analyze(text, date, text, double precision, text, integer);
+
+create function log_and_analyze(
+    p_uid   text,
+    p_today date,
+    p_hash  text,
+    p_rtp   double precision,
+    p_room  text,
+    p_limit integer default null
+) returns table (
+    inserted    boolean,
+    today_count integer,
+    base_used   integer,
+    prev_rtp    double precision,
+    used_extra  boolean,
+    extra_left  integer,
+    over_limit  boolean
+)
+language plpgsql as $$
+declare
+    v_id    usage_logs.id%type;
+    v_base  integer;
+    v_extra integer;
+    v_left  integer;
+begin
+    -- 鎖住會員列，同一用戶的併發分析依序檢查額度
+    select m.extra_limit into v_extra
+      from members m
+     where m.line_user_id = p_uid
+       for update;
+
+    select coalesce((select d.used_count - d.extra_used from usage_daily d
+                      where d.line_user_id = p_uid and d.used_at = p_today), 0)
+      into v_base;
+
+    if p_limit is not null and v_base >= p_limit and coalesce(v_extra, 0) <= 0 then
+        return query select false, 0, v_base, null::double precision, false, 0, true;
+        return;
+    end if;
+
+    insert into usage_logs (line_user_id, used_at, rtp_value, room_id, data_hash)
+    values (p_uid, p_today, p_rtp, p_room, p_hash)
+    on conflict (line_user_id, used_at, data_hash) do nothing
+    returning id into v_id;
+
+    if v_id is not null and p_limit is not null and v_base >= p_limit then
+        update members set extra_limit = extra_limit - 1
+         where line_user_id = p_uid and extra_limit > 0
+        returning extra_limit into v_left;
+        if v_left is not null then
+            update usage_daily set extra_used = extra_used + 1
+             where line_user_id = p_uid and used_at = p_today;
+        end if;
+    end if;
+
+    return query
+    select
+        v_id is not null,
+        coalesce(d.used_count, 0),
+        coalesce(d.used_count - d.extra_used, 0),
+        (select l.rtp_value::double precision from usage_logs l
+          where l.room_id = p_room and l.used_at = p_today
+            and l.id <> v_id and l.data_hash <> p_hash
+          order by l.created_at desc limit 1),
+        v_left is not null,
+        coalesce(v_left, v_extra, 0),
+        false
+    from (select 1) as one
+    left join usage_daily d on d.line_user_id = p_uid and d.used_at = p_today;
+end;
+$$;
@@ -0,0 +1,80 @@
+-- 額外點數扣除順序還原為 20261017000700 的規則：有剩餘點數就先扣點數
+-- 額度檢查只看基礎已用次數 (used_count - extra_used)，點數先扣不影響判斷
+-- 重複截圖先判斷，額度已滿時重傳同一張仍回「已分析過」而不是額度用完
+drop function if exists log_and_analyze(text, date, text, double precision, text, integer);
+
+create function log_and_analyze(
+    p_uid   text,
+    p_today date,
+    p_hash  text,
+    p_rtp   double precision,
+    p_room  text,
+    p_limit integer default null
+) returns table (
+    inserted    boolean,
+    today_count integer,
+    base_used   integer,
+    prev_rtp    double precision,
+    used_extra  boolean,
+    extra_left  integer,
+    over_limit  boolean
+)
+language plpgsql as $$
+declare
+    v_id    usage_logs.id%type;
+    v_base  integer;
+    v_extra integer;
+    v_left  integer;
+begin
+    -- 鎖住會員列，同一用戶的併發分析依序檢查額度
+    select m.extra_limit into v_extra
+      from members m
+     where m.line_user_id = p_uid
+       for update;
+
+    select coalesce((select d.used_count - d.extra_used from usage_daily d
+                      where d.line_user_id = p_uid and d.used_at = p_today), 0)
+      into v_base;
+
+    if exists (select 1 from usage_logs l
+                where l.line_user_id = p_uid and l.used_at = p_today and l.data_hash = p_hash) then
+        return query select false, 0, v_base, null::double precision, false, coalesce(v_extra, 0), false;
+        return;
+    end if;
+
+    if p_limit is not null and v_base >= p_limit and coalesce(v_extra, 0) <= 0 then
+        return query select false, 0, v_base, null::double precision, false, 0, true;
+        return;
+    end if;
+
+    insert into usage_logs (line_user_id, used_at, rtp_value, room_id, data_hash)
+    values (p_uid, p_today, p_rtp, p_room, p_hash)
+    on conflict (line_user_id, used_at, data_hash) do nothing
+    returning id into v_id;
+
+    if v_id is not null then
+        update members set extra_limit = extra_limit - 1
+         where line_user_id = p_uid and extra_limit > 0
+        returning extra_limit into v_left;
+        if v_left is not null then
+            update usage_daily set extra_used = extra_used + 1
+             where line_user_id = p_uid and used_at = p_today;
+        end if;
+    end if;
+
+    return query
+    select
+        v_id is not null,
+        coalesce(d.used_count, 0),
+        coalesce(d.used_count - d.extra_used, 0),
+        (select l.rtp_value::double precision from usage_logs l
+          where l.room_id = p_room and l.used_at = p_today
+            and l.id <> v_id and l.data_hash <> p_hash
+          order by l.created_at desc limit 1),
+        v_left is not null,
+        coalesce(v_left, v_extra, 0),
+        false
+    from (select 1) as one
+    left join usage_daily d on d.line_user_id = p_uid and d.used_at = p_today;
+end;
+$$;
@@ -0,0 +1,23 @@
+# parse_seth_ocr 回歸測試：期望值取自改寫前 (6cbe08b) 的原始解析邏輯
+# 文字為依 OCR.space ParsedText 格式 (\r\n 換行) 重建的樣本，非實際截圖輸出
+import pytest
+
+from ocr_parser import SethResult, parse_seth_ocr
+
+CASES = [
+    # 標籤各佔一行，金額在標籤下一行，RTP 與 % 之間有空白
+    ("賽特 1234 機台\r\n未開 35\r\n今日\r\n總下注\r\n12,345.60\r\n得分率\r\n96.50 %\r\n", ("1234", 35, 12345.6, 96.5)),
+    # 房號在「機台」上一行，未開次數換行
+    ("5678\r\n機台\r\n未開\r\n8\r\n下注額 3,200.00\r\n得分率 101.25%\r\n", ("5678", 8, 3200.0, 101.25)),
+    # 沒有標籤走「今日」區塊；原邏輯取區塊內第一個金額格式數字，RTP 在前時會取到 RTP
+    ("0712 機台\r\n未開12\r\n今日\r\n98.40%\r\n8,800.00\r\n", ("0712", 12, 98.4, 98.4)),
+    ("0712 機台\r\n今日數據\r\n2,450.00\r\n88.80 %\r\n", ("0712", 0, 2450.0, 88.8)),
+    # 只缺得分率標籤，RTP 由「今日」區塊補上
+    ("機台 333\r\n總下注\r\n660.00\r\n今日 得分 120.00%\r\n", ("333", 0, 660.0, 120.0)),
+    # 辨識不到任何欄位
+    ("連線中…\r\n請稍候\r\n", ("未知", 0, 0.0, 0.0)),
+]
+
+@pytest.mark.parametrize("txt, expected", CASES)
+def test_parse_seth_ocr(txt, expected):
+    assert parse_seth_ocr(txt) == SethResult(*expected)